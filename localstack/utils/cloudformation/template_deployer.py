@@ -1,17 +1,28 @@
+import io
 import re
-import os
+import copy
 import json
 import yaml
+import zipfile
 import logging
+import threading
 import traceback
+import contextlib
+from functools import lru_cache
+from collections import deque, namedtuple
 import moto.cloudformation.utils
-from six import iteritems
-from six import string_types
 from localstack.utils import common
 from localstack.utils.aws import aws_stack
 from localstack.services.s3 import s3_listener
-from localstack.utils.testutil import create_zip_file
 from localstack.services.awslambda.lambda_api import get_handler_file_from_name
+try:
+    from yaml import CSafeLoader as BaseSafeLoader
+except ImportError:
+    from yaml import SafeLoader as BaseSafeLoader
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ACTION_CREATE = 'create'
 ACTION_DELETE = 'delete'
@@ -19,36 +30,89 @@ PLACEHOLDER_RESOURCE_NAME = '__resource_name__'
 
 LOG = logging.getLogger(__name__)
 
-# list of resource types that can be updated
-UPDATEABLE_RESOURCES = ['Lambda::Function', 'ApiGateway::Method']
+# set of resource types that can be updated
+UPDATEABLE_RESOURCES = frozenset(['Lambda::Function', 'ApiGateway::Method'])
 
-# list of static attribute references to be replaced in {'Fn::Sub': '...'} strings
-STATIC_REFS = ['AWS::Region', 'AWS::Partition', 'AWS::StackName']
+# set of static attribute references to be replaced in {'Fn::Sub': '...'} strings
+STATIC_REFS = frozenset(['AWS::Region', 'AWS::Partition', 'AWS::StackName'])
+# variables available in Fn::Sub strings without explicit variable map (read-only, shared across calls)
+STATIC_SUB_VARIABLES = {r: {'Ref': r} for r in STATIC_REFS}
+
+# maps CF notification config attributes to S3 notification config/ARN attributes, and CF target attributes
+S3_NOTIFICATION_ATTRS = (
+    ('LambdaConfigurations', 'LambdaFunctionConfigurations', 'LambdaFunctionArn', 'Function'),
+    ('QueueConfigurations', 'QueueConfigurations', 'QueueArn', 'Queue'),
+    ('TopicConfigurations', 'TopicConfigurations', 'TopicArn', 'Topic')
+)
+
+# markers in error messages that indicate a "resource not found" error
+NOT_FOUND_MARKERS = ('NoSuchBucket', 'ResourceNotFound', '404', 'not found')
+
+# thread-local holder for the resource index of the currently active lookup scope
+RESOURCE_INDEX_HOLDER = threading.local()
+
+# regex to detect templates in JSON format
+JSON_TEMPLATE_REGEX = re.compile(r'\s*\{')
+
+# regex to convert CamelCase strings (e.g., ACLs like 'PublicRead') to kebab-case
+CAMEL_TO_KEBAB_REGEX = re.compile(r'(?<!^)(?=[A-Z])')
+
+# regex to match ${Var} placeholders in Fn::Sub strings
+SUB_VARIABLE_REGEX = re.compile(r'\$\{([^}]+)\}')
+
+
+# create safe yaml loader that parses date strings as string, not date objects (using the
+# libyaml-based C loader if available). Note: we use a subclass to leave the global SafeLoader untouched
+class NoDatesSafeLoader(BaseSafeLoader):
+    yaml_implicit_resolvers = {
+        k: [r for r in v if r[0] != 'tag:yaml.org,2002:timestamp'] for
+        k, v in BaseSafeLoader.yaml_implicit_resolvers.items()
+    }
+
+
+yaml.add_multi_constructor('', moto.cloudformation.utils.yaml_tag_constructor, Loader=NoDatesSafeLoader)
 
-# create safe yaml loader that parses date strings as string, not date objects
-NoDatesSafeLoader = yaml.SafeLoader
-NoDatesSafeLoader.yaml_implicit_resolvers = {
-    k: [r for r in v if r[0] != 'tag:yaml.org,2002:timestamp'] for
-    k, v in NoDatesSafeLoader.yaml_implicit_resolvers.items()
-}
+
+def _json_dumps(obj):
+    # use the (much faster) orjson library if available. Note: orjson produces compact output without whitespace
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj)
+
+
+_json_loads = orjson.loads if orjson else json.loads
 
 
 def str_or_none(o):
-    return o if o is None else json.dumps(o) if isinstance(o, (dict, list)) else str(o)
+    return o if o is None else _json_dumps(o) if isinstance(o, (dict, list)) else str(o)
 
 
 def select_attributes(obj, attrs):
-    result = {}
-    for attr in attrs:
-        if obj.get(attr) is not None:
-            result[attr] = str_or_none(obj.get(attr))
-    return result
+    values = ((attr, obj.get(attr)) for attr in attrs)
+    return {attr: str_or_none(value) for attr, value in values if value is not None}
 
 
-def get_bucket_location_config(**kwargs):
+def get_bucket_location_config(*args, **kwargs):
     return {'LocationConstraint': aws_stack.get_region()}
 
 
+def get_bucket_acl_param(params, **kwargs):
+    return convert_acl_cf_to_s3(params.get('AccessControl', 'PublicRead'))
+
+
+def get_sqs_queue_attributes(params, **kwargs):
+    return select_attributes(params, ['DelaySeconds', 'MaximumMessageSize', 'MessageRetentionPeriod',
+        'VisibilityTimeout', 'RedrivePolicy'])
+
+
+def get_dynamodb_stream_spec(params, **kwargs):
+    return common.merge_dicts(params.get('StreamSpecification'), {'StreamEnabled': True}, default=None)
+
+
+def get_state_machine_role_arn(params, **kwargs):
+    return get_role_arn(params.get('RoleArn'), **kwargs)
+
+
 def lambda_get_params():
     return lambda params, **kwargs: params
 
@@ -64,12 +128,7 @@ def rename_params(func, rename_map):
 
 def params_list_to_dict(param_name, key_attr_name, value_attr_name):
     def do_replace(params, **kwargs):
-        result = {}
-        for entry in params.get(param_name, []):
-            key = entry[key_attr_name]
-            value = entry[value_attr_name]
-            result[key] = value
-        return result
+        return {entry[key_attr_name]: entry[value_attr_name] for entry in params.get(param_name, [])}
     return do_replace
 
 
@@ -89,23 +148,27 @@ def get_nested_stack_params(params, **kwargs):
 def get_lambda_code_param(params, **kwargs):
     code = params.get('Code', {})
     zip_file = code.get('ZipFile')
-    if zip_file and not common.is_base64(zip_file):
-        tmp_dir = common.new_tmp_dir()
+    if not zip_file or (isinstance(zip_file, (bytes, bytearray)) and zip_file[:2] == b'PK'):
+        # no inline code, or content is already a zip archive
+        return code
+    if not common.is_base64(zip_file):
+        # create the zip archive with the inline handler code in memory
         handler_file = get_handler_file_from_name(params['Handler'], runtime=params['Runtime'])
-        tmp_file = os.path.join(tmp_dir, handler_file)
-        common.save_file(tmp_file, zip_file)
-        zip_file = create_zip_file(tmp_file, get_content=True)
-        code['ZipFile'] = zip_file
-        common.rm_rf(tmp_dir)
+        zip_info = zipfile.ZipInfo(handler_file)
+        zip_info.external_attr = 0o644 << 16
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, 'w') as zip_archive:
+            zip_archive.writestr(zip_info, zip_file)
+        code['ZipFile'] = content.getvalue()
     return code
 
 
 def sns_subscription_params(params, **kwargs):
     def attr_val(val):
-        return json.dumps(val) if isinstance(val, (dict, list)) else str(val)
+        return _json_dumps(val) if isinstance(val, (dict, list)) else str(val)
 
     attrs = ['DeliveryPolicy', 'FilterPolicy', 'RawMessageDelivery', 'RedrivePolicy']
-    result = dict([(a, attr_val(params[a])) for a in attrs if a in params])
+    result = {a: attr_val(params[a]) for a in attrs if a in params}
     return result
 
 
@@ -114,42 +177,27 @@ def s3_bucket_notification_config(params, **kwargs):
     if not notif_config:
         return None
 
-    lambda_configs = []
-    queue_configs = []
-    topic_configs = []
-
-    attr_tuples = (
-        ('LambdaConfigurations', lambda_configs, 'LambdaFunctionArn', 'Function'),
-        ('QueueConfigurations', queue_configs, 'QueueArn', 'Queue'),
-        ('TopicConfigurations', topic_configs, 'TopicArn', 'Topic')
-    )
-
     # prepare lambda/queue/topic notification configs
-    for attrs in attr_tuples:
-        for config in notif_config.get(attrs[0]) or []:
-            filter_rules = config.get('Filter', {}).get('S3Key', {}).get('Rules')
-            entry = {
-                attrs[2]: config[attrs[3]],
-                'Events': [config['Event']]
-            }
+    result_config = {}
+    for cf_attr, s3_attr, arn_attr, target_attr in S3_NOTIFICATION_ATTRS:
+        entries = result_config[s3_attr] = []
+        for config in notif_config.get(cf_attr) or []:
+            entry = {arn_attr: config[target_attr], 'Events': [config['Event']]}
+            filter_rules = ((config.get('Filter') or {}).get('S3Key') or {}).get('Rules')
             if filter_rules:
                 entry['Filter'] = {'Key': {'FilterRules': filter_rules}}
-            attrs[1].append(entry)
+            entries.append(entry)
 
     # construct final result
     result = {
         'Bucket': params.get('BucketName') or PLACEHOLDER_RESOURCE_NAME,
-        'NotificationConfiguration': {
-            'LambdaFunctionConfigurations': lambda_configs,
-            'QueueConfigurations': queue_configs,
-            'TopicConfigurations': topic_configs
-        }
+        'NotificationConfiguration': result_config
     }
     return result
 
 
 def select_parameters(*param_names):
-    return lambda params, **kwargs: dict([(k, v) for k, v in params.items() if k in param_names])
+    return lambda params, **kwargs: {k: v for k, v in params.items() if k in param_names}
 
 
 def dump_json_params(param_func=None, *param_names):
@@ -160,7 +208,7 @@ def dump_json_params(param_func=None, *param_names):
                 # Fix for https://github.com/localstack/localstack/issues/2022
                 # Convert any date instances to date strings, etc, Version: "2012-10-17"
                 param_value = common.json_safe(result[name])
-                result[name] = json.dumps(param_value)
+                result[name] = _json_dumps(param_value)
         return result
     return replace
 
@@ -175,6 +223,16 @@ def param_defaults(param_func, defaults):
     return replace
 
 
+# parameter functions, constructed once at import time
+PARAMS_IDENTITY = lambda_get_params()
+PARAMS_BUCKET_POLICY = rename_params(dump_json_params(None, 'PolicyDocument'), {'PolicyDocument': 'Policy'})
+PARAMS_IAM_ROLE = param_defaults(
+    dump_json_params(
+        select_parameters('Path', 'RoleName', 'AssumeRolePolicyDocument',
+            'Description', 'MaxSessionDuration', 'PermissionsBoundary', 'Tags'),
+        'AssumeRolePolicyDocument'),
+    {'RoleName': PLACEHOLDER_RESOURCE_NAME})
+
 # maps resource types to functions and parameters for creation
 RESOURCE_TO_FUNCTION = {
     'S3::Bucket': {
@@ -182,8 +240,8 @@ RESOURCE_TO_FUNCTION = {
             'function': 'create_bucket',
             'parameters': {
                 'Bucket': ['BucketName', PLACEHOLDER_RESOURCE_NAME],
-                'ACL': lambda params, **kwargs: convert_acl_cf_to_s3(params.get('AccessControl', 'PublicRead')),
-                'CreateBucketConfiguration': lambda params, **kwargs: get_bucket_location_config()
+                'ACL': get_bucket_acl_param,
+                'CreateBucketConfiguration': get_bucket_location_config
             }
         }, {
             'function': 'put_bucket_notification_configuration',
@@ -199,7 +257,7 @@ RESOURCE_TO_FUNCTION = {
     'S3::BucketPolicy': {
         'create': {
             'function': 'put_bucket_policy',
-            'parameters': rename_params(dump_json_params(None, 'PolicyDocument'), {'PolicyDocument': 'Policy'})
+            'parameters': PARAMS_BUCKET_POLICY
         }
     },
     'SQS::Queue': {
@@ -207,10 +265,7 @@ RESOURCE_TO_FUNCTION = {
             'function': 'create_queue',
             'parameters': {
                 'QueueName': ['QueueName', PLACEHOLDER_RESOURCE_NAME],
-                'Attributes': lambda params, **kwargs: select_attributes(params,
-                    ['DelaySeconds', 'MaximumMessageSize', 'MessageRetentionPeriod',
-                     'VisibilityTimeout', 'RedrivePolicy']
-                ),
+                'Attributes': get_sqs_queue_attributes,
                 'tags': params_list_to_dict('Tags', 'Key', 'Value')
             }
         },
@@ -293,8 +348,7 @@ RESOURCE_TO_FUNCTION = {
                 'ProvisionedThroughput': 'ProvisionedThroughput',
                 'LocalSecondaryIndexes': 'LocalSecondaryIndexes',
                 'GlobalSecondaryIndexes': 'GlobalSecondaryIndexes',
-                'StreamSpecification': lambda params, **kwargs: (
-                    common.merge_dicts(params.get('StreamSpecification'), {'StreamEnabled': True}, default=None))
+                'StreamSpecification': get_dynamodb_stream_spec
             },
             'defaults': {
                 'ProvisionedThroughput': {
@@ -326,13 +380,7 @@ RESOURCE_TO_FUNCTION = {
     'IAM::Role': {
         'create': {
             'function': 'create_role',
-            'parameters':
-                param_defaults(
-                    dump_json_params(
-                        select_parameters('Path', 'RoleName', 'AssumeRolePolicyDocument',
-                            'Description', 'MaxSessionDuration', 'PermissionsBoundary', 'Tags'),
-                        'AssumeRolePolicyDocument'),
-                    {'RoleName': PLACEHOLDER_RESOURCE_NAME})
+            'parameters': PARAMS_IAM_ROLE
         }
     },
     'ApiGateway::RestApi': {
@@ -415,7 +463,7 @@ RESOURCE_TO_FUNCTION = {
             'parameters': {
                 'name': ['StateMachineName', PLACEHOLDER_RESOURCE_NAME],
                 'definition': 'DefinitionString',
-                'roleArn': lambda params, **kwargs: get_role_arn(params.get('RoleArn'), **kwargs)
+                'roleArn': get_state_machine_role_arn
             }
         }
     },
@@ -447,20 +495,167 @@ RESOURCE_TO_FUNCTION = {
     }
 }
 
+
+@lru_cache(maxsize=512)
+def _classify(res_type):
+    """ Return a tuple (service_name, resource_type) for the given full resource type
+        (e.g., 'AWS::S3::Bucket' -> ('s3', 'S3::Bucket')), or (None, None) for invalid types. """
+    parts = res_type.split('::')
+    if len(parts) == 1:
+        return None, None
+    service_name = 'cognito-idp' if parts[-2] == 'Cognito' else parts[1].lower()
+    return service_name, '::'.join(parts[1:])
+
+
+class DispatchEntry(namedtuple('DispatchEntry', ['config', 'service', 'create', 'delete'])):
+    """ Flattened view of a RESOURCE_TO_FUNCTION entry, with the 'create'/'delete' function
+        configs normalized to tuples (or None if the action is not supported). """
+
+    def action(self, action_name):
+        if action_name == ACTION_CREATE:
+            return self.create
+        if action_name == ACTION_DELETE:
+            return self.delete
+
+
+def _normalize_action(config, action_name):
+    funcs = config.get(action_name)
+    if funcs is None:
+        return None
+    return tuple(funcs) if isinstance(funcs, list) else (funcs,)
+
+
+def _build_dispatch_entry(resource_type, config):
+    # note: this also pre-populates the _classify(..) cache for all known resource types
+    service = _classify('AWS::%s' % resource_type)[0]
+    return DispatchEntry(config, service, _normalize_action(config, ACTION_CREATE),
+        _normalize_action(config, ACTION_DELETE))
+
+
+# flattened dispatch table for RESOURCE_TO_FUNCTION, built once at import time
+RESOURCE_DISPATCH = {k: _build_dispatch_entry(k, v) for k, v in RESOURCE_TO_FUNCTION.items()}
+
+
+def get_dispatch_entry(resource_type):
+    """ Return the DispatchEntry for the given resource type, or None if the type is unknown. """
+    config = RESOURCE_TO_FUNCTION.get(resource_type)
+    if config is None:
+        return None
+    entry = RESOURCE_DISPATCH.get(resource_type)
+    if entry is None or entry.config is not config:
+        # RESOURCE_TO_FUNCTION has been extended/patched after import - (re-)build the entry
+        entry = RESOURCE_DISPATCH[resource_type] = _build_dispatch_entry(resource_type, config)
+    return entry
+
 # ----------------
 # UTILITY METHODS
 # ----------------
 
 
+@lru_cache(maxsize=64)
 def convert_acl_cf_to_s3(acl):
     """ Convert a CloudFormation ACL string (e.g., 'PublicRead') to an S3 ACL string (e.g., 'public-read') """
-    return re.sub('(?<!^)(?=[A-Z])', '-', acl).lower()
+    return CAMEL_TO_KEBAB_REGEX.sub('-', acl).lower()
+
+
+@lru_cache(maxsize=None)
+def _connect_cached(service_name, region_name, client=True):
+    # connecting to a service involves environment/endpoint lookups on every call - memoize per service and region
+    return aws_stack.connect_to_service(service_name, client=client, region_name=region_name)
+
+
+def _get_service_cached(service_name):
+    return _connect_cached(service_name, aws_stack.get_region())
+
+
+def _get_resource_cached(service_name):
+    return _connect_cached(service_name, aws_stack.get_region(), client=False)
+
+
+class ResourceIndex(object):
+    """ Lazily populated index of existing resources (queues, topics, state machines, etc), used to
+        avoid repeated list_* API calls and linear scans when looking up the details of multiple resources. """
+
+    def __init__(self):
+        self.entries = {}
+        self.resolved_refs = {}
+
+    def clear(self):
+        self.entries.clear()
+        self.resolved_refs.clear()
+
+    def get_cached(self, key, loader):
+        """ Return the entry with the given key, calling `loader` to create it if it does not exist yet. """
+        if key not in self.entries:
+            self.entries[key] = loader()
+        return self.entries[key]
+
+    def resolve_refs(self, stack_name, value, resources):
+        """ Resolve references in the given value, caching the results for structured values (e.g., Ref/GetAtt). """
+        if not isinstance(value, (dict, list)):
+            return resolve_refs_recursively(stack_name, value, resources)
+        key = (stack_name, id(resources), repr(value))
+        if key not in self.resolved_refs:
+            self.resolved_refs[key] = resolve_refs_recursively(stack_name, value, resources)
+        return self.resolved_refs[key]
+
+    def queue_url(self, queue_name):
+        queues = self.get_cached('sqs', lambda: {url.rpartition('/')[2]: url for url in
+            _get_service_cached('sqs').list_queues().get('QueueUrls', [])})
+        return queues.get(queue_name)
+
+    def topic(self, topic_arn):
+        topics = self.get_cached('sns', lambda: {t['TopicArn']: t for t in
+            _get_service_cached('sns').list_topics().get('Topics', [])})
+        return topics.get(topic_arn)
+
+    def rest_api(self, api_name):
+        apis = self.get_cached('apigateway', lambda: {api['name']: api for api in
+            reversed(_get_service_cached('apigateway').get_rest_apis()['items'])})
+        return apis.get(api_name)
+
+    def state_machine_arn(self, sm_name):
+        state_machines = self.get_cached('stepfunctions', lambda: {m['name']: m['stateMachineArn'] for m in
+            reversed(_get_service_cached('stepfunctions').list_state_machines()['stateMachines'])})
+        return state_machines.get(sm_name)
+
+    def bucket_notifications(self, bucket_name):
+        return self.get_cached('s3-notifications:%s' % bucket_name,
+            lambda: _get_service_cached('s3').get_bucket_notification_configuration(Bucket=bucket_name))
+
+    def activity_arn(self, act_name):
+        activities = self.get_cached('stepfunctions-activities', lambda: {a['name']: a['activityArn'] for a in
+            reversed(_get_service_cached('stepfunctions').list_activities()['activities'])})
+        return activities.get(act_name)
+
+
+@contextlib.contextmanager
+def resource_index_scope():
+    """ Share a single ResourceIndex between all resource lookups within this scope (nested scopes
+        reuse the outer index). The index is cleared whenever a resource is created or deleted. """
+    index = getattr(RESOURCE_INDEX_HOLDER, 'index', None)
+    if index is not None:
+        yield index
+        return
+    index = RESOURCE_INDEX_HOLDER.index = ResourceIndex()
+    try:
+        yield index
+    finally:
+        RESOURCE_INDEX_HOLDER.index = None
+
+
+def get_resource_index():
+    """ Return the index of the active lookup scope, or a new (single-use) index if no scope is active. """
+    return getattr(RESOURCE_INDEX_HOLDER, 'index', None) or ResourceIndex()
 
 
 def retrieve_topic_arn(topic_name):
-    topics = aws_stack.connect_to_service('sns').list_topics()['Topics']
-    topic_arns = [t['TopicArn'] for t in topics if t['TopicArn'].endswith(':%s' % topic_name)]
-    return topic_arns[0]
+    topics = _get_service_cached('sns').list_topics()['Topics']
+    suffix = ':%s' % topic_name
+    topic_arn = next((t['TopicArn'] for t in topics if t['TopicArn'].endswith(suffix)), None)
+    if not topic_arn:
+        raise KeyError('Unable to find SNS topic with name "%s"' % topic_name)
+    return topic_arn
 
 
 def get_role_arn(role_arn, **kwargs):
@@ -473,39 +668,47 @@ def get_role_arn(role_arn, **kwargs):
 # ---------------------
 
 def parse_template(template):
-    try:
-        return json.loads(template)
-    except Exception:
-        yaml.add_multi_constructor('', moto.cloudformation.utils.yaml_tag_constructor, Loader=NoDatesSafeLoader)
+    template = common.to_str(template)
+    result = _parse_json_template(template)
+    if result is not None:
+        return result
+    # return a copy, as callers may modify the parsed template
+    return copy.deepcopy(_parse_yaml_template(template))
+
+
+def _parse_json_template(template):
+    """ Parse the given template if it is in JSON format, otherwise return None. Note: JSON templates are
+        not cached, as parsing JSON is considerably faster than creating a (deep) copy of a cached result. """
+    # skip the (failing) JSON parse attempt for YAML templates
+    if JSON_TEMPLATE_REGEX.match(template):
         try:
-            return yaml.safe_load(template)
+            return _json_loads(template)
         except Exception:
-            return yaml.load(template, Loader=NoDatesSafeLoader)
+            pass
+
 
+@lru_cache(maxsize=32)
+def _parse_yaml_template(template):
+    return yaml.load(template, Loader=NoDatesSafeLoader)
 
+
+@lru_cache(maxsize=32)
 def template_to_json(template):
-    template = parse_template(template)
-    return json.dumps(template)
+    template = common.to_str(template)
+    result = _parse_json_template(template)
+    if result is None:
+        result = _parse_yaml_template(template)
+    return _json_dumps(result)
 
 
 def get_resource_type(resource):
     res_type = resource.get('ResourceType') or resource.get('Type') or ''
-    parts = res_type.split('::', 1)
-    if len(parts) == 1:
-        return None
-    return parts[1]
+    return _classify(res_type)[1]
 
 
 def get_service_name(resource):
     res_type = resource.get('Type', resource.get('ResourceType', ''))
-    parts = res_type.split('::')
-    if len(parts) == 1:
-        return None
-    if res_type.endswith('Cognito::UserPool'):
-        return 'cognito-idp'
-    if parts[-2] == 'Cognito':
-        return 'cognito-idp'
-    return parts[1].lower()
+    return _classify(res_type)[0]
 
 
 def get_resource_name(resource):
@@ -527,34 +730,208 @@ def get_resource_name(resource):
     elif res_type == 'IAM::Role':
         name = properties.get('RoleName')
     else:
-        LOG.warning('Unable to extract name for resource type "%s"' % res_type)
+        LOG.warning('Unable to extract name for resource type "%s"', res_type)
 
     return name
 
 
-def get_client(resource, func_config):
-    resource_type = get_resource_type(resource)
-    service = get_service_name(resource)
-    resource_config = RESOURCE_TO_FUNCTION.get(resource_type)
-    if resource_config is None:
+def get_client(resource, func_config, resource_type=None):
+    resource_type = resource_type or get_resource_type(resource)
+    entry = get_dispatch_entry(resource_type)
+    if entry is None:
         raise Exception('CloudFormation deployment for resource type %s not yet implemented' % resource_type)
+    service = entry.service
     try:
         if func_config.get('boto_client') == 'resource':
-            return aws_stack.connect_to_resource(service)
-        return aws_stack.connect_to_service(service)
+            return _get_resource_cached(service)
+        return _get_service_cached(service)
     except Exception as e:
-        LOG.warning('Unable to get client for "%s" API, skipping deployment: %s' % (service, e))
+        LOG.warning('Unable to get client for "%s" API, skipping deployment: %s', service, e)
         return None
 
 
 def describe_stack_resource(stack_name, logical_resource_id):
-    client = aws_stack.connect_to_service('cloudformation')
+    client = _get_service_cached('cloudformation')
     try:
         result = client.describe_stack_resource(StackName=stack_name, LogicalResourceId=logical_resource_id)
         return result['StackResourceDetail']
     except Exception as e:
-        LOG.warning('Unable to get details for resource "%s" in CloudFormation stack "%s": %s' %
-                    (logical_resource_id, stack_name, e))
+        LOG.warning('Unable to get details for resource "%s" in CloudFormation stack "%s": %s',
+                    logical_resource_id, stack_name, e)
+
+
+def _retrieve_lambda_function(resource_id, props, resources, stack_name, index):
+    props['FunctionName'] = props.get('FunctionName') or '{}-lambda-{}'.format(stack_name[:45], common.short_uid())
+    return _get_service_cached('lambda').get_function(FunctionName=props['FunctionName'])
+
+
+def _retrieve_lambda_version(resource_id, props, resources, stack_name, index):
+    name = props.get('FunctionName')
+    if not name:
+        return None
+    func_name = aws_stack.lambda_function_name(name)
+    func_version = name.split(':')[7] if len(name.split(':')) > 7 else '$LATEST'
+    versions = _get_service_cached('lambda').list_versions_by_function(FunctionName=func_name)
+    return next((v for v in versions['Versions'] if v['Version'] == func_version), None)
+
+
+def _retrieve_lambda_event_source_mapping(resource_id, props, resources, stack_name, index):
+    function_name = index.resolve_refs(stack_name, props['FunctionName'], resources)
+    source_arn = index.resolve_refs(stack_name, props.get('EventSourceArn'), resources)
+    if not function_name or not source_arn:
+        raise Exception('ResourceNotFound')
+    mappings = _get_service_cached('lambda').list_event_source_mappings(
+        FunctionName=function_name, EventSourceArn=source_arn)
+    function_arn = aws_stack.lambda_function_arn(function_name)
+    mapping = next((m for m in mappings['EventSourceMappings'] if
+        m['EventSourceArn'] == source_arn and m['FunctionArn'] == function_arn), None)
+    if not mapping:
+        raise Exception('ResourceNotFound')
+    return mapping
+
+
+def _retrieve_iam_role(resource_id, props, resources, stack_name, index):
+    role_name = index.resolve_refs(stack_name, props.get('RoleName') or resource_id, resources)
+    return _get_service_cached('iam').get_role(RoleName=role_name)['Role']
+
+
+def _retrieve_dynamodb_table(resource_id, props, resources, stack_name, index):
+    table_name = index.resolve_refs(stack_name, props.get('TableName') or resource_id, resources)
+    return _get_service_cached('dynamodb').describe_table(TableName=table_name)
+
+
+def _retrieve_apigateway_rest_api(resource_id, props, resources, stack_name, index):
+    api_name = index.resolve_refs(stack_name, props['Name'], resources)
+    return index.rest_api(api_name)
+
+
+def _retrieve_apigateway_resource(resource_id, props, resources, stack_name, index):
+    api_id = index.resolve_refs(stack_name, props['RestApiId'], resources)
+    parent_id = index.resolve_refs(stack_name, props['ParentId'], resources)
+    if not api_id or not parent_id:
+        return None
+    api_resources = _get_service_cached('apigateway').get_resources(restApiId=api_id)['items']
+    path_part = props['PathPart']
+    target_resource = next((res for res in api_resources if
+        res.get('parentId') == parent_id and res['pathPart'] == path_part), None)
+    if not target_resource:
+        return None
+    path = aws_stack.get_apigateway_path_for_resource(api_id,
+        target_resource['id'], resources=api_resources)
+    return next((res for res in api_resources if res['path'] == path), None)
+
+
+def _retrieve_apigateway_deployment(resource_id, props, resources, stack_name, index):
+    api_id = index.resolve_refs(stack_name, props['RestApiId'], resources)
+    if not api_id:
+        return None
+    result = _get_service_cached('apigateway').get_deployments(restApiId=api_id)['items']
+    # TODO possibly filter results by stage name or other criteria
+    return result[0] if result else None
+
+
+def _retrieve_apigateway_method(resource_id, props, resources, stack_name, index):
+    api_id = index.resolve_refs(stack_name, props['RestApiId'], resources)
+    res_id = index.resolve_refs(stack_name, props['ResourceId'], resources)
+    if not api_id or not res_id:
+        return None
+    res_obj = _get_service_cached('apigateway').get_resource(restApiId=api_id, resourceId=res_id)
+    match = [v for (k, v) in res_obj.get('resourceMethods', {}).items()
+             if props['HttpMethod'] in (v.get('httpMethod'), k)]
+    int_props = props.get('Integration') or {}
+    if int_props.get('Type') == 'AWS_PROXY':
+        match = [m for m in match if
+            m.get('methodIntegration', {}).get('type') == 'AWS_PROXY' and
+            m.get('methodIntegration', {}).get('httpMethod') == int_props.get('IntegrationHttpMethod')]
+    return any(match) or None
+
+
+def _retrieve_apigateway_gateway_response(resource_id, props, resources, stack_name, index):
+    api_id = index.resolve_refs(stack_name, props['RestApiId'], resources)
+    client = _get_service_cached('apigateway')
+    result = client.get_gateway_response(restApiId=api_id, responseType=props['ResponseType'])
+    return result if 'responseType' in result else None
+
+
+def _retrieve_sqs_queue(resource_id, props, resources, stack_name, index):
+    # TODO possibly find a better way to compare resource_id with queue URLs
+    queue_url = index.queue_url(resource_id)
+    if not queue_url:
+        return None
+    sqs_client = _get_service_cached('sqs')
+    result = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['All'])['Attributes']
+    result['Arn'] = result['QueueArn']
+    return result
+
+
+def _retrieve_sns_topic(resource_id, props, resources, stack_name, index):
+    return index.topic(resource_id)
+
+
+def _retrieve_s3_bucket(resource_id, props, resources, stack_name, index):
+    bucket_name = index.resolve_refs(stack_name, props.get('BucketName') or resource_id, resources)
+    bucket_name = s3_listener.normalize_bucket_name(bucket_name)
+    response = _get_service_cached('s3').get_bucket_location(Bucket=bucket_name)
+    notifs = props.get('NotificationConfiguration')
+    if not response or not notifs:
+        return response
+    configs = index.bucket_notifications(bucket_name)
+    has_notifs = (configs.get('TopicConfigurations') or configs.get('QueueConfigurations') or
+        configs.get('LambdaFunctionConfigurations'))
+    if notifs and not has_notifs:
+        return None
+    return response
+
+
+def _retrieve_s3_bucket_policy(resource_id, props, resources, stack_name, index):
+    bucket_name = index.resolve_refs(stack_name, props.get('Bucket') or resource_id, resources)
+    return _get_service_cached('s3').get_bucket_policy(Bucket=bucket_name)
+
+
+def _retrieve_logs_log_group(resource_id, props, resources, stack_name, index):
+    # TODO implement
+    raise Exception('ResourceNotFound')
+
+
+def _retrieve_kinesis_stream(resource_id, props, resources, stack_name, index):
+    stream_name = index.resolve_refs(stack_name, props['Name'], resources)
+    return _get_service_cached('kinesis').describe_stream(StreamName=stream_name)
+
+
+def _retrieve_state_machine(resource_id, props, resources, stack_name, index):
+    sm_name = index.resolve_refs(stack_name, props.get('StateMachineName') or resource_id, resources)
+    sm_arn = index.state_machine_arn(sm_name)
+    if not sm_arn:
+        return None
+    return _get_service_cached('stepfunctions').describe_state_machine(stateMachineArn=sm_arn)
+
+
+def _retrieve_activity(resource_id, props, resources, stack_name, index):
+    act_name = index.resolve_refs(stack_name, props.get('Name') or resource_id, resources)
+    return index.activity_arn(act_name)
+
+
+# maps resource types to functions that retrieve the details of deployed resources
+RETRIEVE_DETAILS_FUNCTIONS = {
+    'Lambda::Function': _retrieve_lambda_function,
+    'Lambda::Version': _retrieve_lambda_version,
+    'Lambda::EventSourceMapping': _retrieve_lambda_event_source_mapping,
+    'IAM::Role': _retrieve_iam_role,
+    'DynamoDB::Table': _retrieve_dynamodb_table,
+    'ApiGateway::RestApi': _retrieve_apigateway_rest_api,
+    'ApiGateway::Resource': _retrieve_apigateway_resource,
+    'ApiGateway::Deployment': _retrieve_apigateway_deployment,
+    'ApiGateway::Method': _retrieve_apigateway_method,
+    'ApiGateway::GatewayResponse': _retrieve_apigateway_gateway_response,
+    'SQS::Queue': _retrieve_sqs_queue,
+    'SNS::Topic': _retrieve_sns_topic,
+    'S3::Bucket': _retrieve_s3_bucket,
+    'S3::BucketPolicy': _retrieve_s3_bucket_policy,
+    'Logs::LogGroup': _retrieve_logs_log_group,
+    'Kinesis::Stream': _retrieve_kinesis_stream,
+    'StepFunctions::StateMachine': _retrieve_state_machine,
+    'StepFunctions::Activity': _retrieve_activity
+}
 
 
 def retrieve_resource_details(resource_id, resource_status, resources, stack_name):
@@ -563,155 +940,14 @@ def retrieve_resource_details(resource_id, resource_status, resources, stack_nam
     if not resource:
         resource = {}
     resource_type = get_resource_type(resource)
-    resource_props = resource.get('Properties')
     try:
-        if resource_type == 'Lambda::Function':
-            resource_props['FunctionName'] = (resource_props.get('FunctionName') or
-                '{}-lambda-{}'.format(stack_name[:45], common.short_uid()))
-            resource_id = resource_props['FunctionName'] if resource else resource_id
-            return aws_stack.connect_to_service('lambda').get_function(FunctionName=resource_id)
-        elif resource_type == 'Lambda::Version':
-            name = resource_props.get('FunctionName')
-            if not name:
-                return None
-            func_name = aws_stack.lambda_function_name(name)
-            func_version = name.split(':')[7] if len(name.split(':')) > 7 else '$LATEST'
-            versions = aws_stack.connect_to_service('lambda').list_versions_by_function(FunctionName=func_name)
-            return ([v for v in versions['Versions'] if v['Version'] == func_version] or [None])[0]
-        elif resource_type == 'Lambda::EventSourceMapping':
-            resource_id = resource_props['FunctionName'] if resource else resource_id
-            source_arn = resource_props.get('EventSourceArn')
-            resource_id = resolve_refs_recursively(stack_name, resource_id, resources)
-            source_arn = resolve_refs_recursively(stack_name, source_arn, resources)
-            if not resource_id or not source_arn:
-                raise Exception('ResourceNotFound')
-            mappings = aws_stack.connect_to_service('lambda').list_event_source_mappings(
-                FunctionName=resource_id, EventSourceArn=source_arn)
-            mapping = list(filter(lambda m:
-                m['EventSourceArn'] == source_arn and m['FunctionArn'] == aws_stack.lambda_function_arn(resource_id),
-                mappings['EventSourceMappings']))
-            if not mapping:
-                raise Exception('ResourceNotFound')
-            return mapping[0]
-        elif resource_type == 'IAM::Role':
-            role_name = resource_props.get('RoleName') or resource_id
-            role_name = resolve_refs_recursively(stack_name, role_name, resources)
-            return aws_stack.connect_to_service('iam').get_role(RoleName=role_name)['Role']
-        elif resource_type == 'DynamoDB::Table':
-            table_name = resource_props.get('TableName') or resource_id
-            table_name = resolve_refs_recursively(stack_name, table_name, resources)
-            return aws_stack.connect_to_service('dynamodb').describe_table(TableName=table_name)
-        elif resource_type == 'ApiGateway::RestApi':
-            apis = aws_stack.connect_to_service('apigateway').get_rest_apis()['items']
-            api_name = resource_props['Name'] if resource else resource_id
-            api_name = resolve_refs_recursively(stack_name, api_name, resources)
-            result = list(filter(lambda api: api['name'] == api_name, apis))
-            return result[0] if result else None
-        elif resource_type == 'ApiGateway::Resource':
-            api_id = resource_props['RestApiId'] if resource else resource_id
-            api_id = resolve_refs_recursively(stack_name, api_id, resources)
-            parent_id = resolve_refs_recursively(stack_name, resource_props['ParentId'], resources)
-            if not api_id or not parent_id:
-                return None
-            api_resources = aws_stack.connect_to_service('apigateway').get_resources(restApiId=api_id)['items']
-            target_resource = list(filter(lambda res:
-                res.get('parentId') == parent_id and res['pathPart'] == resource_props['PathPart'], api_resources))
-            if not target_resource:
-                return None
-            path = aws_stack.get_apigateway_path_for_resource(api_id,
-                target_resource[0]['id'], resources=api_resources)
-            result = list(filter(lambda res: res['path'] == path, api_resources))
-            return result[0] if result else None
-        elif resource_type == 'ApiGateway::Deployment':
-            api_id = resource_props['RestApiId'] if resource else resource_id
-            api_id = resolve_refs_recursively(stack_name, api_id, resources)
-            if not api_id:
-                return None
-            result = aws_stack.connect_to_service('apigateway').get_deployments(restApiId=api_id)['items']
-            # TODO possibly filter results by stage name or other criteria
-            return result[0] if result else None
-        elif resource_type == 'ApiGateway::Method':
-            api_id = resolve_refs_recursively(stack_name, resource_props['RestApiId'], resources)
-            res_id = resolve_refs_recursively(stack_name, resource_props['ResourceId'], resources)
-            if not api_id or not res_id:
-                return None
-            res_obj = aws_stack.connect_to_service('apigateway').get_resource(restApiId=api_id, resourceId=res_id)
-            match = [v for (k, v) in res_obj.get('resourceMethods', {}).items()
-                     if resource_props['HttpMethod'] in (v.get('httpMethod'), k)]
-            int_props = resource_props.get('Integration') or {}
-            if int_props.get('Type') == 'AWS_PROXY':
-                match = [m for m in match if
-                    m.get('methodIntegration', {}).get('type') == 'AWS_PROXY' and
-                    m.get('methodIntegration', {}).get('httpMethod') == int_props.get('IntegrationHttpMethod')]
-            return any(match) or None
-        elif resource_type == 'ApiGateway::GatewayResponse':
-            api_id = resolve_refs_recursively(stack_name, resource_props['RestApiId'], resources)
-            client = aws_stack.connect_to_service('apigateway')
-            result = client.get_gateway_response(restApiId=api_id, responseType=resource_props['ResponseType'])
-            return result if 'responseType' in result else None
-        elif resource_type == 'SQS::Queue':
-            sqs_client = aws_stack.connect_to_service('sqs')
-            queues = sqs_client.list_queues()
-            result = list(filter(lambda item:
-                # TODO possibly find a better way to compare resource_id with queue URLs
-                item.endswith('/%s' % resource_id), queues.get('QueueUrls', [])))
-            if not result:
-                return None
-            result = sqs_client.get_queue_attributes(QueueUrl=result[0], AttributeNames=['All'])['Attributes']
-            result['Arn'] = result['QueueArn']
-            return result
-        elif resource_type == 'SNS::Topic':
-            topics = aws_stack.connect_to_service('sns').list_topics()
-            result = list(filter(lambda item: item['TopicArn'] == resource_id, topics.get('Topics', [])))
-            return result[0] if result else None
-        elif resource_type == 'S3::Bucket':
-            bucket_name = resource_props.get('BucketName') or resource_id
-            bucket_name = resolve_refs_recursively(stack_name, bucket_name, resources)
-            bucket_name = s3_listener.normalize_bucket_name(bucket_name)
-            s3_client = aws_stack.connect_to_service('s3')
-            response = s3_client.get_bucket_location(Bucket=bucket_name)
-            notifs = resource_props.get('NotificationConfiguration')
-            if not response or not notifs:
-                return response
-            configs = s3_client.get_bucket_notification_configuration(Bucket=bucket_name)
-            has_notifs = (configs.get('TopicConfigurations') or configs.get('QueueConfigurations') or
-                configs.get('LambdaFunctionConfigurations'))
-            if notifs and not has_notifs:
-                return None
-            return response
-        elif resource_type == 'S3::BucketPolicy':
-            bucket_name = resource_props.get('Bucket') or resource_id
-            bucket_name = resolve_refs_recursively(stack_name, bucket_name, resources)
-            return aws_stack.connect_to_service('s3').get_bucket_policy(Bucket=bucket_name)
-        elif resource_type == 'Logs::LogGroup':
-            # TODO implement
-            raise Exception('ResourceNotFound')
-        elif resource_type == 'Kinesis::Stream':
-            stream_name = resolve_refs_recursively(stack_name, resource_props['Name'], resources)
-            result = aws_stack.connect_to_service('kinesis').describe_stream(StreamName=stream_name)
-            return result
-        elif resource_type == 'StepFunctions::StateMachine':
-            sm_name = resource_props.get('StateMachineName') or resource_id
-            sm_name = resolve_refs_recursively(stack_name, sm_name, resources)
-            sfn_client = aws_stack.connect_to_service('stepfunctions')
-            state_machines = sfn_client.list_state_machines()['stateMachines']
-            sm_arn = [m['stateMachineArn'] for m in state_machines if m['name'] == sm_name]
-            if not sm_arn:
-                return None
-            result = sfn_client.describe_state_machine(stateMachineArn=sm_arn[0])
-            return result
-        elif resource_type == 'StepFunctions::Activity':
-            act_name = resource_props.get('Name') or resource_id
-            act_name = resolve_refs_recursively(stack_name, act_name, resources)
-            sfn_client = aws_stack.connect_to_service('stepfunctions')
-            activities = sfn_client.list_activities()['activities']
-            result = [a['activityArn'] for a in activities if a['name'] == act_name]
-            if not result:
-                return None
-            return result[0]
+        retrieve_func = RETRIEVE_DETAILS_FUNCTIONS.get(resource_type)
+        if retrieve_func:
+            # note: the index of the active lookup scope is used to avoid repeated lookups/ref resolution
+            return retrieve_func(resource_id, resource.get('Properties'), resources, stack_name, get_resource_index())
         if is_deployable_resource(resource):
-            LOG.warning('Unexpected resource type %s when resolving references of resource %s: %s' %
-                        (resource_type, resource_id, resource))
+            LOG.warning('Unexpected resource type %s when resolving references of resource %s: %s',
+                        resource_type, resource_id, resource)
     except Exception as e:
         check_not_found_exception(e, resource_type, resource, resource_status)
     return None
@@ -719,14 +955,14 @@ def retrieve_resource_details(resource_id, resource_status, resources, stack_nam
 
 def check_not_found_exception(e, resource_type, resource, resource_status):
     # we expect this to be a "not found" exception
-    markers = ['NoSuchBucket', 'ResourceNotFound', '404', 'not found']
-    if not list(filter(lambda marker, e=e: marker in str(e), markers)):
-        LOG.warning('Unexpected error retrieving details for resource %s: %s %s - %s %s' %
-            (resource_type, e, traceback.format_exc(), resource, resource_status))
+    message = str(e)
+    if not any(marker in message for marker in NOT_FOUND_MARKERS):
+        LOG.warning('Unexpected error retrieving details for resource %s: %s %s - %s %s',
+            resource_type, e, traceback.format_exc(), resource, resource_status)
 
 
 def extract_resource_attribute(resource_type, resource, attribute):
-    LOG.debug('Extract resource attribute: %s %s' % (resource_type, attribute))
+    LOG.debug('Extract resource attribute: %s %s', resource_type, attribute)
     # extract resource specific attributes
     if resource_type == 'Lambda::Function':
         actual_attribute = 'FunctionArn' if attribute == 'Arn' else attribute
@@ -739,15 +975,20 @@ def extract_resource_attribute(resource_type, resource, attribute):
         if attribute == 'PhysicalResourceId':
             return resource['id']
         if attribute == 'RootResourceId':
-            resources = aws_stack.connect_to_service('apigateway').get_resources(restApiId=resource['id'])['items']
+            resources = _get_service_cached('apigateway').get_resources(restApiId=resource['id'])['items']
             for res in resources:
                 if res['path'] == '/' and not res.get('parentId'):
                     return res['id']
     elif resource_type == 'ApiGateway::Resource':
         if attribute == 'PhysicalResourceId':
             return resource['id']
-    attribute_lower = common.first_char_to_lower(attribute)
-    return resource.get(attribute) or resource.get(attribute_lower)
+    return resource.get(attribute) or resource.get(_attribute_to_lower(attribute))
+
+
+@lru_cache(maxsize=256)
+def _attribute_to_lower(attribute):
+    # attribute names come from a small set (Arn, Name, ...) - memoize the lowercase variant
+    return common.first_char_to_lower(attribute)
 
 
 def resolve_ref(stack_name, ref, resources, attribute):
@@ -766,7 +1007,8 @@ def resolve_ref(stack_name, ref, resources, attribute):
     # second, resolve resource references
     resource_status = {}
     if stack_name:
-        resource_status = describe_stack_resource(stack_name, ref)
+        resource_status = get_resource_index().get_cached(('stack-resource', stack_name, ref),
+            lambda: describe_stack_resource(stack_name, ref))
         if not resource_status:
             return
         attr_value = resource_status.get(attribute)
@@ -782,77 +1024,118 @@ def resolve_ref(stack_name, ref, resources, attribute):
     resource_type = get_resource_type(resource)
     result = extract_resource_attribute(resource_type, resource_new, attribute)
     if not result:
-        LOG.warning('Unable to extract reference attribute %s from resource: %s' % (attribute, resource_new))
+        LOG.warning('Unable to extract reference attribute %s from resource: %s', attribute, resource_new)
     return result
 
 
 def resolve_refs_recursively(stack_name, value, resources):
-    if isinstance(value, dict):
-        keys_list = list(value.keys())
-        # process special operators
-        if keys_list == ['Ref']:
-            return resolve_ref(stack_name, value['Ref'],
-                resources, attribute='PhysicalResourceId')
-        if keys_list and keys_list[0].lower() == 'fn::getatt':
-            return resolve_ref(stack_name, value[keys_list[0]][0],
-                resources, attribute=value[keys_list[0]][1])
-        if keys_list and keys_list[0].lower() == 'fn::join':
-            join_values = value[keys_list[0]][1]
-            join_values = [resolve_refs_recursively(stack_name, v, resources) for v in join_values]
-            none_values = [v for v in join_values if v is None]
-            if none_values:
-                raise Exception('Cannot resolve CF fn::Join %s due to null values: %s' % (value, join_values))
-            return value[keys_list[0]][0].join(join_values)
-        if keys_list and keys_list[0].lower() == 'fn::sub':
-            item_to_sub = value[keys_list[0]]
-            if not isinstance(item_to_sub, list):
-                attr_refs = dict([(r, {'Ref': r}) for r in STATIC_REFS])
-                item_to_sub = [item_to_sub, attr_refs]
-            result = item_to_sub[0]
-            for key, val in item_to_sub[1].items():
-                val = resolve_refs_recursively(stack_name, val, resources)
-                result = result.replace('${%s}' % key, val)
-            return result
-        else:
-            for key, val in iteritems(value):
-                value[key] = resolve_refs_recursively(stack_name, val, resources)
-    if isinstance(value, list):
-        for i in range(0, len(value)):
-            value[i] = resolve_refs_recursively(stack_name, value[i], resources)
+    """ Resolve the intrinsic functions (Ref, Fn::GetAtt, ...) in the given value. Nested dicts/lists are
+        updated in place, walking the object tree with an explicit stack instead of recursive calls. """
+    result = _resolve_intrinsic_function(stack_name, value, resources)
+    if result is not value or not isinstance(value, (dict, list)):
+        return result
+    # bind globals to locals, as they are looked up for each visited node
+    resolve_intrinsic = _resolve_intrinsic_function
+    stack = [value]
+    while stack:
+        container = stack.pop()
+        for key, val in (container.items() if isinstance(container, dict) else enumerate(container)):
+            if isinstance(val, dict):
+                new_val = resolve_intrinsic(stack_name, val, resources)
+                if new_val is not val:
+                    container[key] = new_val
+                    continue
+                stack.append(val)
+            elif isinstance(val, list):
+                stack.append(val)
     return value
 
 
+def _resolve_intrinsic_function(stack_name, value, resources):
+    """ Return the resolved value if the given value is an intrinsic function, otherwise the value itself. """
+    if isinstance(value, dict) and len(value) == 1:
+        key = next(iter(value))
+        handler = INTRINSIC_FUNCTIONS.get(key)
+        if handler:
+            return handler(stack_name, value[key], resources)
+    return value
+
+
+def _resolve_fn_ref(stack_name, ref, resources):
+    return resolve_ref(stack_name, ref, resources, attribute='PhysicalResourceId')
+
+
+def _resolve_fn_get_att(stack_name, args, resources):
+    return resolve_ref(stack_name, args[0], resources, attribute=args[1])
+
+
+def _resolve_fn_join(stack_name, args, resources):
+    join_values = [resolve_refs_recursively(stack_name, v, resources) for v in args[1]]
+    if any(v is None for v in join_values):
+        raise Exception('Cannot resolve CF fn::Join %s due to null values: %s' % (args, join_values))
+    return args[0].join(join_values)
+
+
+def _resolve_fn_sub(stack_name, item_to_sub, resources):
+    if not isinstance(item_to_sub, list):
+        if '${' not in item_to_sub:
+            # fast path - nothing to substitute
+            return item_to_sub
+        item_to_sub = [item_to_sub, STATIC_SUB_VARIABLES]
+    result, variables = item_to_sub[0], item_to_sub[1]
+    if '${' not in result:
+        return result
+    # resolve only the variables actually referenced in the string, then substitute in a single scan
+    values = {key: resolve_refs_recursively(stack_name, variables[key], resources)
+        for key in set(SUB_VARIABLE_REGEX.findall(result)) if key in variables}
+    if not values:
+        return result
+    if any(v is None for v in values.values()):
+        raise Exception('Cannot resolve CF fn::Sub %s due to null values: %s' % (item_to_sub, values))
+    return SUB_VARIABLE_REGEX.sub(lambda match: values.get(match.group(1), match.group(0)), result)
+
+
+# maps intrinsic function names (and their lowercase aliases) to resolver functions
+INTRINSIC_FUNCTIONS = {
+    'Ref': _resolve_fn_ref,
+    'Fn::GetAtt': _resolve_fn_get_att,
+    'Fn::Join': _resolve_fn_join,
+    'Fn::Sub': _resolve_fn_sub
+}
+INTRINSIC_FUNCTIONS.update({name.lower(): func for name, func in list(INTRINSIC_FUNCTIONS.items())
+    if name != 'Ref'})
+
+
 def get_stack_parameter(stack_name, parameter):
     try:
-        client = aws_stack.connect_to_service('cloudformation')
+        client = _get_service_cached('cloudformation')
         stack = client.describe_stacks(StackName=stack_name)['Stacks']
     except Exception:
         return None
     stack = stack and stack[0]
     if not stack:
         return None
-    result = [p['ParameterValue'] for p in stack['Parameters'] if p['ParameterKey'] == parameter]
-    return (result or [None])[0]
+    return next((p['ParameterValue'] for p in stack['Parameters'] if p['ParameterKey'] == parameter), None)
 
 
 def update_resource(resource_id, resources, stack_name):
     resource = resources[resource_id]
     resource_type = get_resource_type(resource)
     if resource_type not in UPDATEABLE_RESOURCES:
-        LOG.warning('Unable to update resource type "%s", id "%s"' % (resource_type, resource_id))
+        LOG.warning('Unable to update resource type "%s", id "%s"', resource_type, resource_id)
         return
-    LOG.info('Updating resource %s of type %s' % (resource_id, resource_type))
+    LOG.info('Updating resource %s of type %s', resource_id, resource_type)
     props = resource['Properties']
     if resource_type == 'Lambda::Function':
-        client = aws_stack.connect_to_service('lambda')
+        client = _get_service_cached('lambda')
         keys = ('FunctionName', 'Role', 'Handler', 'Description', 'Timeout', 'MemorySize', 'Environment', 'Runtime')
-        update_props = dict([(k, props[k]) for k in keys if k in props])
+        update_props = {k: props[k] for k in keys if k in props}
         update_props = resolve_refs_recursively(stack_name, update_props, resources)
         if 'Code' in props:
             client.update_function_code(FunctionName=props['FunctionName'], **props['Code'])
         return client.update_function_configuration(**update_props)
     if resource_type == 'ApiGateway::Method':
-        client = aws_stack.connect_to_service('apigateway')
+        client = _get_service_cached('apigateway')
         integration = props.get('Integration')
         # TODO use RESOURCE_TO_FUNCTION mechanism for updates, instead of hardcoding here
         kwargs = {
@@ -870,54 +1153,40 @@ def update_resource(resource_id, resources, stack_name):
         return client.put_method(**kwargs)
 
 
-def fix_account_id_in_arns(params):
-    def fix_ids(o, **kwargs):
-        if isinstance(o, dict):
-            for k, v in o.items():
-                if common.is_string(v, exclude_binary=True):
-                    o[k] = aws_stack.fix_account_id_in_arns(v)
-        elif common.is_string(o, exclude_binary=True):
-            o = aws_stack.fix_account_id_in_arns(o)
-        return o
-    result = common.recurse_object(params, fix_ids)
-    return result
-
-
-def convert_data_types(func_details, params):
-    """ Convert data types in the "params" object, with the type defs
-        specified in the 'types' attribute of "func_details". """
-    types = func_details.get('types') or {}
-    attr_names = types.keys() or []
+def cast_value(value, value_type):
+    if value_type == bool:
+        return value in ['True', 'true', True]
+    if value_type == str:
+        return str(value)
+    if value_type == int:
+        return int(value)
+    return value
 
-    def cast(_obj, _type):
-        if _type == bool:
-            return _obj in ['True', 'true', True]
-        if _type == str:
-            return str(_obj)
-        if _type == int:
-            return int(_obj)
-        return _obj
 
-    def fix_types(o, **kwargs):
-        if isinstance(o, dict):
-            for k, v in o.items():
-                if k in attr_names:
-                    o[k] = cast(v, types[k])
-        return o
-    result = common.recurse_object(params, fix_types)
-    return result
+def normalize_params(params, types=None):
+    """ Normalize the given params in a single recursive pass: convert moto account IDs in ARNs
+        to our format, convert data types (with the type defs in "types"), and remove None values. """
+    types = types or {}
 
+    def normalize(obj):
+        if isinstance(obj, dict):
+            for key, value in list(obj.items()):
+                value = normalize(value)
+                if key in types:
+                    value = cast_value(value, types[key])
+                if value is None:
+                    obj.pop(key)
+                else:
+                    obj[key] = value
+        elif isinstance(obj, list):
+            for i, value in enumerate(obj):
+                obj[i] = normalize(value)
+        elif common.is_string(obj, exclude_binary=True) and 'arn:' in obj:
+            # skip the regex replacement for strings that cannot contain an ARN
+            obj = aws_stack.fix_account_id_in_arns(obj)
+        return obj
 
-def remove_none_values(params):
-    """ Remove None values recursively in the given object. """
-    def remove_nones(o, **kwargs):
-        if isinstance(o, dict):
-            for k, v in dict(o).items():
-                if v is None:
-                    o.pop(k)
-        return o
-    result = common.recurse_object(params, remove_nones)
-    return result
+    return normalize(params)
 
 
 def deploy_resource(resource_id, resources, stack_name):
@@ -931,32 +1200,33 @@ def delete_resource(resource_id, resources, stack_name):
 def execute_resource_action(resource_id, resources, stack_name, action_name):
     resource = resources[resource_id]
     resource_type = get_resource_type(resource)
-    func_details = RESOURCE_TO_FUNCTION.get(resource_type)
-    if not func_details or action_name not in func_details:
-        LOG.warning('Action "%s" for resource type %s not yet implemented' % (action_name, resource_type))
+    entry = get_dispatch_entry(resource_type)
+    func_details = entry and entry.action(action_name)
+    if func_details is None:
+        LOG.warning('Action "%s" for resource type %s not yet implemented', action_name, resource_type)
         return
 
-    LOG.debug('Running action "%s" for resource type "%s" id "%s"' % (action_name, resource_type, resource_id))
-    func_details = func_details[action_name]
-    func_details = func_details if isinstance(func_details, list) else [func_details]
+    LOG.debug('Running action "%s" for resource type "%s" id "%s"', action_name, resource_type, resource_id)
     results = []
     for func in func_details:
         if callable(func['function']):
             result = func['function'](resource_id, resources, resource_type, func, stack_name)
             results.append(result)
             continue
-        client = get_client(resource, func)
+        client = get_client(resource, func, resource_type)
         if client:
             result = configure_resource_via_sdk(resource_id, resources, resource_type, func, stack_name)
             results.append(result)
+    # resources have been created/deleted - invalidate the index of the active lookup scope
+    get_resource_index().clear()
     return (results or [None])[0]
 
 
 def configure_resource_via_sdk(resource_id, resources, resource_type, func_details, stack_name):
     resource = resources[resource_id]
-    client = get_client(resource, func_details)
+    client = get_client(resource, func_details, resource_type)
     function = getattr(client, func_details['function'])
-    params = func_details.get('parameters') or lambda_get_params()
+    params = func_details.get('parameters') or PARAMS_IDENTITY
     defaults = func_details.get('defaults', {})
     if 'Properties' not in resource:
         resource['Properties'] = {}
@@ -965,9 +1235,9 @@ def configure_resource_via_sdk(resource_id, resources, resource_type, func_detai
     if callable(params):
         params = params(resource_props, stack_name=stack_name, resources=resources)
     else:
-        params = dict(params)
-        for param_key, prop_keys in dict(params).items():
-            params.pop(param_key, None)
+        param_mapping = params
+        params = {}
+        for param_key, prop_keys in param_mapping.items():
             if not isinstance(prop_keys, list):
                 prop_keys = [prop_keys]
             for prop_key in prop_keys:
@@ -1003,36 +1273,38 @@ def configure_resource_via_sdk(resource_id, resources, resource_type, func_detai
         return
 
     # convert refs and boolean strings
-    for param_key, param_value in dict(params).items():
-        if param_value is not None:
+    for param_key, param_value in params.items():
+        # only dicts/lists can contain references - literal values are used as-is
+        if isinstance(param_value, (dict, list)):
             param_value = params[param_key] = resolve_refs_recursively(stack_name, param_value, resources)
         # Convert to boolean (TODO: do this recursively?)
-        if str(param_value).lower() in ['true', 'false']:
-            params[param_key] = str(param_value).lower() == 'true'
+        if isinstance(param_value, str):
+            value_lower = param_value.lower()
+            if value_lower in ('true', 'false'):
+                params[param_key] = value_lower == 'true'
 
-    # convert any moto account IDs (123456789012) in ARNs to our format (000000000000)
-    params = fix_account_id_in_arns(params)
-    # convert data types (e.g., boolean strings to bool)
-    params = convert_data_types(func_details, params)
-    # remove None values, as they usually raise boto3 errors
-    params = remove_none_values(params)
+    # convert any moto account IDs (123456789012) in ARNs to our format (000000000000), convert
+    # data types (e.g., boolean strings to bool), and remove None values (usually raise boto3 errors)
+    params = normalize_params(params, func_details.get('types'))
 
     # invoke function
     try:
-        LOG.debug('Request for resource type "%s" in region %s: %s %s' % (
-            resource_type, aws_stack.get_region(), func_details['function'], params))
+        LOG.debug('Request for resource type "%s" in region %s: %s %s',
+            resource_type, aws_stack.get_region(), func_details['function'], params)
         result = function(**params)
     except Exception as e:
-        LOG.warning('Error calling %s with params: %s for resource: %s' % (function, params, resource))
+        LOG.warning('Error calling %s with params: %s for resource: %s', function, params, resource)
         raise e
 
     # some resources have attached/nested resources which we need to create recursively now
     if resource_type == 'ApiGateway::Method':
         integration = resource_props.get('Integration')
-        apigateway = aws_stack.connect_to_service('apigateway')
-        if integration:
+        responses = resource_props.get('MethodResponses') or []
+        apigateway = _get_service_cached('apigateway')
+        if integration or responses:
             api_id = resolve_refs_recursively(stack_name, resource_props['RestApiId'], resources)
             res_id = resolve_refs_recursively(stack_name, resource_props['ResourceId'], resources)
+        if integration:
             kwargs = {}
             if integration.get('Uri'):
                 uri = resolve_refs_recursively(stack_name, integration.get('Uri'), resources)
@@ -1041,10 +1313,7 @@ def configure_resource_via_sdk(resource_id, resources, resource_type, func_detai
                 kwargs['integrationHttpMethod'] = integration['IntegrationHttpMethod']
             apigateway.put_integration(restApiId=api_id, resourceId=res_id,
                 httpMethod=resource_props['HttpMethod'], type=integration['Type'], **kwargs)
-        responses = resource_props.get('MethodResponses') or []
         for response in responses:
-            api_id = resolve_refs_recursively(stack_name, resource_props['RestApiId'], resources)
-            res_id = resolve_refs_recursively(stack_name, resource_props['ResourceId'], resources)
             apigateway.put_method_response(restApiId=api_id, resourceId=res_id,
                 httpMethod=resource_props['HttpMethod'], statusCode=response['StatusCode'],
                 responseParameters=response.get('ResponseParameters', {}))
@@ -1053,12 +1322,12 @@ def configure_resource_via_sdk(resource_id, resources, resource_type, func_detai
         for subscription in subscriptions:
             endpoint = resolve_refs_recursively(stack_name, subscription['Endpoint'], resources)
             topic_arn = retrieve_topic_arn(params['Name'])
-            aws_stack.connect_to_service('sns').subscribe(
+            _get_service_cached('sns').subscribe(
                 TopicArn=topic_arn, Protocol=subscription['Protocol'], Endpoint=endpoint)
     elif resource_type == 'S3::Bucket':
         tags = resource_props.get('Tags')
         if tags:
-            aws_stack.connect_to_service('s3').put_bucket_tagging(
+            _get_service_cached('s3').put_bucket_tagging(
                 Bucket=params['Bucket'], Tagging={'TagSet': tags})
 
     return result
@@ -1066,7 +1335,7 @@ def configure_resource_via_sdk(resource_id, resources, resource_type, func_detai
 
 # TODO remove?
 def deploy_template(template, stack_name):
-    if isinstance(template, string_types):
+    if isinstance(template, str):
         template = parse_template(template)
 
     resource_map = template.get('Resources')
@@ -1074,6 +1343,25 @@ def deploy_template(template, stack_name):
         LOG.warning('CloudFormation template contains no Resources section')
         return
 
+    ordered_ids = _topological_order(resource_map)
+    if ordered_ids is None:
+        LOG.debug('Cyclic resource dependencies in stack %s, falling back to iterative deployment', stack_name)
+        return _deploy_template_iteratively(resource_map, stack_name)
+
+    for resource_id in ordered_ids:
+        resource = resource_map[resource_id]
+        resource['__details__'] = describe_stack_resource(stack_name, resource_id)
+        if not is_deployable_resource(resource) or is_deployed(resource_id, resource_map, stack_name):
+            continue
+        # dependencies may have been skipped during deployment (e.g., no client or params available)
+        if not all_resource_dependencies_satisfied(resource_id, resource_map, stack_name):
+            LOG.warning('Unable to deploy resource %s in stack %s - dependencies not satisfied',
+                resource_id, stack_name)
+            continue
+        deploy_resource(resource_id, resource_map, stack_name=stack_name)
+
+
+def _deploy_template_iteratively(resource_map, stack_name):
     next = resource_map
 
     iters = 10
@@ -1092,13 +1380,14 @@ def deploy_template(template, stack_name):
             deploy_resource(resource_id, resource_map, stack_name=stack_name)
 
     LOG.warning('Unable to resolve all dependencies and deploy all resources ' +
-        'after %s iterations. Remaining (%s): %s' % (iters, len(next), next))
+        'after %s iterations. Remaining (%s): %s', iters, len(next), next)
 
 
 def delete_stack(stack_name, stack_resources):
-    resources = dict([(r['LogicalResourceId'], common.clone_safe(r)) for r in stack_resources])
-    for key, resource in resources.items():
-        resources[key]['Properties'] = common.clone_safe(resource)
+    resources = {r['LogicalResourceId']: common.clone_safe(r) for r in stack_resources}
+    for resource in resources.values():
+        # the resource summaries contain no properties - expose their (flat) attributes as properties instead
+        resource['Properties'] = dict(resource)
     for resource_id, resource in resources.items():
         delete_resource(resource_id, resources, stack_name)
 
@@ -1109,35 +1398,41 @@ def delete_stack(stack_name, stack_resources):
 
 def is_deployable_resource(resource):
     resource_type = get_resource_type(resource)
-    entry = RESOURCE_TO_FUNCTION.get(resource_type)
+    entry = get_dispatch_entry(resource_type)
     if entry is None:
-        LOG.warning('Unknown resource type "%s": %s' % (resource_type, resource))
-    return bool(entry and entry.get(ACTION_CREATE))
+        LOG.warning('Unknown resource type "%s": %s', resource_type, resource)
+    return bool(entry and entry.create)
 
 
 def is_deployed(resource_id, resources, stack_name):
     resource = resources[resource_id]
     resource_status = resource.get('__details__') or {}
-    details = retrieve_resource_details(resource_id, resource_status, resources, stack_name)
-    return bool(details)
+
+    def check_deployed():
+        return bool(retrieve_resource_details(resource_id, resource_status, resources, stack_name))
+
+    # the status is cached for the active lookup scope, as it is usually checked multiple times (e.g., as dependency)
+    cache_key = ('deployed', stack_name, id(resources), resource_id)
+    return get_resource_index().get_cached(cache_key, check_deployed)
 
 
 def should_be_deployed(resource_id, resources, stack_name):
     """ Return whether the given resource is all of: (1) deployable, (2) not yet deployed,
         and (3) has no unresolved dependencies. """
     resource = resources[resource_id]
-    if not is_deployable_resource(resource) or is_deployed(resource_id, resources, stack_name):
-        return False
-    return all_resource_dependencies_satisfied(resource_id, resources, stack_name)
+    with resource_index_scope():
+        if not is_deployable_resource(resource) or is_deployed(resource_id, resources, stack_name):
+            return False
+        return all_resource_dependencies_satisfied(resource_id, resources, stack_name)
 
 
 def is_updateable(resource_id, resources, stack_name):
     """ Return whether the given resource can be updated or not """
     resource = resources[resource_id]
-    if not is_deployable_resource(resource) or not is_deployed(resource_id, resources, stack_name):
+    # check the (constant-time) type membership first, before looking up the deployment state
+    if get_resource_type(resource) not in UPDATEABLE_RESOURCES:
         return False
-    resource_type = get_resource_type(resource)
-    return resource_type in UPDATEABLE_RESOURCES
+    return is_deployable_resource(resource) and is_deployed(resource_id, resources, stack_name)
 
 
 def all_resource_dependencies_satisfied(resource_id, resources, stack_name):
@@ -1147,33 +1442,67 @@ def all_resource_dependencies_satisfied(resource_id, resources, stack_name):
 
 
 def all_dependencies_satisfied(resources, stack_name, all_resources, depending_resource=None):
-    for resource_id, resource in iteritems(resources):
-        if is_deployable_resource(resource):
-            if not is_deployed(resource_id, all_resources, stack_name):
-                return False
+    with resource_index_scope():
+        for resource_id, resource in resources.items():
+            if is_deployable_resource(resource):
+                if not is_deployed(resource_id, all_resources, stack_name):
+                    return False
     return True
 
 
 def resources_to_deploy_next(resources, stack_name):
     result = {}
-    for resource_id, resource in resources.items():
-        if should_be_deployed(resource_id, resources, stack_name):
-            result[resource_id] = resource
+    with resource_index_scope():
+        for resource_id, resource in resources.items():
+            if should_be_deployed(resource_id, resources, stack_name):
+                result[resource_id] = resource
     return result
 
 
 def get_resource_dependencies(resource_id, resource, resources):
-    result = {}
-    dumped = json.dumps(common.json_safe(resource))
-    dependencies = resource.get('DependsOn', [])
-    dependencies = dependencies if isinstance(dependencies, list) else [dependencies]
-    for other_id, other in resources.items():
-        if resource != other:
-            # TODO: traverse dict instead of doing string search
-            search1 = '{"Ref": "%s"}' % other_id
-            search2 = '{"Fn::GetAtt": ["%s", ' % other_id
-            if search1 in dumped or search2 in dumped:
-                result[other_id] = other
-            if other_id in dependencies:
-                result[other_id] = other
+    dependencies = _collect_refs(resource, {})
+    depends_on = resource.get('DependsOn', [])
+    for other_id in (depends_on if isinstance(depends_on, list) else [depends_on]):
+        dependencies[other_id] = True
+    return {other_id: resources[other_id] for other_id in dependencies
+        if other_id in resources and other_id != resource_id}
+
+
+def _topological_order(resources):
+    """ Return the logical IDs of the given resources in dependency order (using Kahn's algorithm),
+        or None if the dependency graph contains a cycle. """
+    dependencies = {resource_id: set(get_resource_dependencies(resource_id, resource, resources))
+        for resource_id, resource in resources.items()}
+    dependents = {resource_id: [] for resource_id in resources}
+    for resource_id, deps in dependencies.items():
+        for other_id in deps:
+            dependents[other_id].append(resource_id)
+    queue = deque(resource_id for resource_id, deps in dependencies.items() if not deps)
+    result = []
+    while queue:
+        resource_id = queue.popleft()
+        result.append(resource_id)
+        for other_id in dependents[resource_id]:
+            deps = dependencies[other_id]
+            deps.discard(resource_id)
+            if not deps:
+                queue.append(other_id)
+    return result if len(result) == len(resources) else None
+
+
+def _collect_refs(obj, result):
+    """ Collect the logical IDs referenced via {'Ref': ..} or {'Fn::GetAtt': [..]} in the given
+        object into the `result` dict (used as an insertion-ordered set), and return the result. """
+    if isinstance(obj, dict):
+        ref = obj.get('Ref')
+        if isinstance(ref, str):
+            result[ref] = True
+        get_att = obj.get('Fn::GetAtt')
+        if isinstance(get_att, list) and len(get_att) > 1 and isinstance(get_att[0], str):
+            result[get_att[0]] = True
+        for value in obj.values():
+            _collect_refs(value, result)
+    elif isinstance(obj, list):
+        for value in obj:
+            _collect_refs(value, result)
     return result
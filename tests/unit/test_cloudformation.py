@@ -1,5 +1,10 @@
+import io
 import re
+import json
+import zipfile
+import yaml
 import unittest
+from unittest import mock
 from localstack.utils.cloudformation import template_deployer
 
 
@@ -18,3 +23,241 @@ class CloudFormationTest(unittest.TestCase):
         result = template_deployer.resolve_refs_recursively(stack_name, ref, resources)
         pattern = r'arn:aws:apigateway:.*:lambda:path/2015-03-31/functions/test:lambda:arn/invocations'
         self.assertTrue(re.match(pattern, result))
+
+    def test_convert_acl_cf_to_s3(self):
+        self.assertEqual(template_deployer.convert_acl_cf_to_s3('PublicRead'), 'public-read')
+        self.assertEqual(template_deployer.convert_acl_cf_to_s3('BucketOwnerFullControl'),
+            'bucket-owner-full-control')
+        self.assertEqual(template_deployer.convert_acl_cf_to_s3('Private'), 'private')
+
+    @mock.patch.object(template_deployer, '_get_service_cached')
+    def test_resource_index_scope(self, get_client):
+        client = get_client.return_value
+        client.list_queues.return_value = {'QueueUrls': ['http://localhost:4576/queue/q1']}
+        with template_deployer.resource_index_scope():
+            index = template_deployer.get_resource_index()
+            self.assertEqual(index.queue_url('q1'), 'http://localhost:4576/queue/q1')
+            self.assertIsNone(index.queue_url('q2'))
+            self.assertIs(template_deployer.get_resource_index(), index)
+        self.assertEqual(client.list_queues.call_count, 1)
+        self.assertIsNot(template_deployer.get_resource_index(), index)
+
+    def test_parse_template(self):
+        template_json = '{"Resources": {"Q": {"Type": "AWS::SQS::Queue"}}}'
+        template_yaml = 'Resources:\n  Q:\n    Type: AWS::SQS::Queue\n    Properties:\n      QueueName: !Ref Name\n'
+        result = template_deployer.parse_template(template_json)
+        self.assertEqual(result, {'Resources': {'Q': {'Type': 'AWS::SQS::Queue'}}})
+        result['Resources'].clear()
+        self.assertEqual(len(template_deployer.parse_template(template_json)['Resources']), 1)
+        result = template_deployer.parse_template(template_yaml)
+        self.assertEqual(result['Resources']['Q']['Properties'], {'QueueName': {'Ref': 'Name'}})
+        self.assertEqual(json.loads(template_deployer.template_to_json(template_yaml)), result)
+
+    def test_parse_template_yaml_dates(self):
+        template = 'Version: 2012-10-17\nResources: {}\n'
+        result = template_deployer.parse_template(template)
+        self.assertEqual(result['Version'], '2012-10-17')
+        # make sure the global yaml SafeLoader is not modified
+        self.assertNotEqual(yaml.safe_load(template)['Version'], '2012-10-17')
+
+    def test_get_dispatch_entry(self):
+        entry = template_deployer.get_dispatch_entry('S3::Bucket')
+        self.assertEqual(entry.service, 's3')
+        self.assertEqual(len(entry.action('create')), 2)
+        self.assertEqual(len(entry.action('delete')), 1)
+        self.assertIsNone(template_deployer.get_dispatch_entry('Logs::LogGroup').create)
+        self.assertIsNone(template_deployer.get_dispatch_entry('Foo::Bar'))
+
+    def test_s3_bucket_notification_config(self):
+        rules = [{'Name': 'prefix', 'Value': 'foo/'}]
+        params = {'BucketName': 'b1', 'NotificationConfiguration': {
+            'QueueConfigurations': [{'Queue': 'q1', 'Event': 's3:ObjectCreated:*',
+                'Filter': {'S3Key': {'Rules': rules}}}],
+            'TopicConfigurations': [{'Topic': 't1', 'Event': 's3:ObjectRemoved:*'}]
+        }}
+        result = template_deployer.s3_bucket_notification_config(params)
+        self.assertEqual(result['Bucket'], 'b1')
+        self.assertEqual(result['NotificationConfiguration'], {
+            'LambdaFunctionConfigurations': [],
+            'QueueConfigurations': [{'QueueArn': 'q1', 'Events': ['s3:ObjectCreated:*'],
+                'Filter': {'Key': {'FilterRules': rules}}}],
+            'TopicConfigurations': [{'TopicArn': 't1', 'Events': ['s3:ObjectRemoved:*']}]
+        })
+        self.assertIsNone(template_deployer.s3_bucket_notification_config({}))
+
+    @mock.patch.object(template_deployer, 'resolve_refs_recursively')
+    def test_resource_index_resolve_refs(self, resolve):
+        resolve.return_value = 'resolved'
+        index = template_deployer.ResourceIndex()
+        resources = {}
+        for i in range(3):
+            self.assertEqual(index.resolve_refs('s1', {'Ref': 'MyQueue'}, resources), 'resolved')
+        self.assertEqual(resolve.call_count, 1)
+        index.clear()
+        index.resolve_refs('s1', {'Ref': 'MyQueue'}, resources)
+        self.assertEqual(resolve.call_count, 2)
+
+    def test_get_resource_type_and_service(self):
+        resource = {'Type': 'AWS::S3::Bucket'}
+        self.assertEqual(template_deployer.get_resource_type(resource), 'S3::Bucket')
+        self.assertEqual(template_deployer.get_service_name(resource), 's3')
+        resource = {'ResourceType': 'AWS::ApiGateway::Method::Integration'}
+        self.assertEqual(template_deployer.get_resource_type(resource), 'ApiGateway::Method::Integration')
+        self.assertEqual(template_deployer.get_service_name(resource), 'apigateway')
+        self.assertEqual(template_deployer.get_service_name({'Type': 'AWS::Cognito::UserPool'}), 'cognito-idp')
+        self.assertIsNone(template_deployer.get_resource_type({}))
+        self.assertIsNone(template_deployer.get_service_name({}))
+
+    def test_parse_template_formats(self):
+        expected = {'Resources': {'T': {'Type': 'AWS::SNS::Topic'}}}
+        templates = [
+            '  {"Resources": {"T": {"Type": "AWS::SNS::Topic"}}}',
+            b'{"Resources": {"T": {"Type": "AWS::SNS::Topic"}}}',
+            '{Resources: {T: {Type: "AWS::SNS::Topic"}}}',
+            'Resources:\n  T: {Type: AWS::SNS::Topic}\n'
+        ]
+        for template in templates:
+            self.assertEqual(template_deployer.parse_template(template), expected)
+            self.assertEqual(json.loads(template_deployer.template_to_json(template)), expected)
+
+    def test_get_lambda_code_param(self):
+        code = 'def handler(event, context):\n    return event\n'
+        params = {'Handler': 'index.handler', 'Runtime': 'python3.8', 'Code': {'ZipFile': code}}
+        result = template_deployer.get_lambda_code_param(params)
+        with zipfile.ZipFile(io.BytesIO(result['ZipFile'])) as zip_file:
+            self.assertEqual(zip_file.namelist(), ['index.py'])
+            self.assertEqual(zip_file.read('index.py').decode('utf-8'), code)
+        # existing zip archives are passed through unmodified
+        zip_content = result['ZipFile']
+        params['Code'] = {'ZipFile': zip_content}
+        self.assertIs(template_deployer.get_lambda_code_param(params)['ZipFile'], zip_content)
+
+    def test_select_attributes_and_params_list(self):
+        props = {'DelaySeconds': 5, 'VisibilityTimeout': None, 'RedrivePolicy': {'maxReceiveCount': 3},
+            'Tags': [{'Key': 'k1', 'Value': 'v1'}, {'Key': 'k2', 'Value': 'v2'}]}
+        result = template_deployer.select_attributes(props, ['DelaySeconds', 'VisibilityTimeout', 'RedrivePolicy'])
+        self.assertEqual(result['DelaySeconds'], '5')
+        self.assertEqual(json.loads(result['RedrivePolicy']), {'maxReceiveCount': 3})
+        self.assertNotIn('VisibilityTimeout', result)
+        tags = template_deployer.params_list_to_dict('Tags', 'Key', 'Value')(props)
+        self.assertEqual(tags, {'k1': 'v1', 'k2': 'v2'})
+
+    @mock.patch.object(template_deployer, '_get_service_cached')
+    def test_retrieve_resource_details(self, get_client):
+        topic_arn = 'arn:aws:sns:us-east-1:000000000000:t1'
+        get_client.return_value.list_topics.return_value = {'Topics': [{'TopicArn': topic_arn}]}
+        resources = {'T1': {'Type': 'AWS::SNS::Topic', 'Properties': {}}}
+        result = template_deployer.retrieve_resource_details('T1', {'PhysicalResourceId': topic_arn}, resources, 's1')
+        self.assertEqual(result, {'TopicArn': topic_arn})
+        result = template_deployer.retrieve_resource_details('T1', {}, resources, 's1')
+        self.assertIsNone(result)
+        resources = {'F1': {'Type': 'AWS::Foo::Bar'}}
+        self.assertIsNone(template_deployer.retrieve_resource_details('F1', {}, resources, 's1'))
+
+    @mock.patch.object(template_deployer, 'resolve_ref')
+    def test_resolve_fn_sub(self, resolve_ref):
+        resolve_ref.side_effect = lambda stack_name, ref, resources, attribute: 'val-%s' % ref
+        result = template_deployer.resolve_refs_recursively('s1', {'Fn::Sub': 'no-variables'}, {})
+        self.assertEqual(result, 'no-variables')
+        self.assertFalse(resolve_ref.called)
+        value = {'Fn::Sub': ['${Var1}-${Var1}', {'Var1': {'Ref': 'R1'}, 'Var2': {'Ref': 'R2'}}]}
+        result = template_deployer.resolve_refs_recursively('s1', value, {})
+        self.assertEqual(result, 'val-R1-val-R1')
+        self.assertEqual(resolve_ref.call_count, 1)
+        value = {'Fn::Sub': ['${AWS::Region}/${Unknown}', {'AWS::Region': {'Ref': 'AWS::Region'}}]}
+        result = template_deployer.resolve_refs_recursively('s1', value, {})
+        self.assertEqual(result, 'val-AWS::Region/${Unknown}')
+
+    @mock.patch.object(template_deployer, 'resolve_ref')
+    def test_resolve_fn_sub_null_values(self, resolve_ref):
+        resolve_ref.return_value = None
+        with self.assertRaises(Exception):
+            template_deployer.resolve_refs_recursively('s1', {'Fn::Sub': 'arn:${AWS::Region}:x'}, {})
+        value = {'Fn::Sub': ['${A}-${B}', {'A': {'Ref': 'X'}, 'B': 'lit'}]}
+        with self.assertRaises(Exception):
+            template_deployer.resolve_refs_recursively('s1', value, {})
+
+    @mock.patch.object(template_deployer, 'resolve_ref')
+    def test_resolve_intrinsic_functions(self, resolve_ref):
+        resolve_ref.side_effect = lambda stack_name, ref, resources, attribute: '%s.%s' % (ref, attribute)
+        value = {
+            'Name': {'Ref': 'Queue'},
+            'Arn': {'fn::getatt': ['Queue', 'Arn']},
+            'Items': [1, {'Fn::Join': ['/', ['a', {'Ref': 'Topic'}]]}],
+            'Other': {'Ref': 'Queue', 'Key': 'v'}
+        }
+        result = template_deployer.resolve_refs_recursively('s1', value, {})
+        self.assertEqual(result['Name'], 'Queue.PhysicalResourceId')
+        self.assertEqual(result['Arn'], 'Queue.Arn')
+        self.assertEqual(result['Items'], [1, 'a/Topic.PhysicalResourceId'])
+        self.assertEqual(result['Other'], {'Ref': 'Queue', 'Key': 'v'})
+
+        # deeply nested values must not hit the recursion limit
+        nested = leaf = {}
+        for i in range(5000):
+            leaf['Child'] = leaf = {}
+        leaf['Value'] = {'Ref': 'Queue'}
+        template_deployer.resolve_refs_recursively('s1', nested, {})
+        self.assertEqual(leaf['Value'], 'Queue.PhysicalResourceId')
+
+    def test_get_resource_dependencies(self):
+        resources = {
+            'Queue': {'Type': 'AWS::SQS::Queue', 'Properties': {'QueueName': 'q1'}},
+            'Role': {'Type': 'AWS::IAM::Role', 'Properties': {}},
+            'Topic': {'Type': 'AWS::SNS::Topic', 'Properties': {}},
+            'Func': {'Type': 'AWS::Lambda::Function', 'DependsOn': 'Topic', 'Properties': {
+                'Role': {'Fn::GetAtt': ['Role', 'Arn']},
+                'Environment': {'Variables': {'QUEUE': {'Ref': 'Queue'}, 'REGION': {'Ref': 'AWS::Region'}}}
+            }}
+        }
+        result = template_deployer.get_resource_dependencies('Func', resources['Func'], resources)
+        self.assertEqual(set(result.keys()), {'Queue', 'Role', 'Topic'})
+        self.assertEqual(template_deployer.get_resource_dependencies('Queue', resources['Queue'], resources), {})
+
+    @mock.patch.object(template_deployer, 'retrieve_resource_details')
+    def test_is_deployed_cached_per_scope(self, retrieve_details):
+        retrieve_details.return_value = {'QueueUrl': 'http://localhost:4576/queue/q1'}
+        resources = {'Queue': {'Type': 'AWS::SQS::Queue', 'Properties': {'QueueName': 'q1'}}}
+        with template_deployer.resource_index_scope():
+            self.assertTrue(template_deployer.is_deployed('Queue', resources, 'stack1'))
+            self.assertTrue(template_deployer.is_deployed('Queue', resources, 'stack1'))
+        self.assertEqual(retrieve_details.call_count, 1)
+        template_deployer.is_deployed('Queue', resources, 'stack1')
+        self.assertEqual(retrieve_details.call_count, 2)
+
+    def test_topological_order(self):
+        resources = {
+            'Func': {'Type': 'AWS::Lambda::Function', 'Properties': {'Role': {'Fn::GetAtt': ['Role', 'Arn']}}},
+            'Role': {'Type': 'AWS::IAM::Role', 'DependsOn': 'Topic', 'Properties': {}},
+            'Topic': {'Type': 'AWS::SNS::Topic', 'Properties': {}}
+        }
+        self.assertEqual(template_deployer._topological_order(resources), ['Topic', 'Role', 'Func'])
+        resources['Topic']['DependsOn'] = 'Func'
+        self.assertIsNone(template_deployer._topological_order(resources))
+
+    @mock.patch.object(template_deployer, 'deploy_resource')
+    @mock.patch.object(template_deployer, 'is_deployed')
+    @mock.patch.object(template_deployer, 'describe_stack_resource')
+    def test_deploy_template_skips_unsatisfied_dependencies(self, describe_resource, is_deployed, deploy_resource):
+        # the queue deployment is silently skipped, hence the dependent topic must not be deployed
+        is_deployed.return_value = False
+        template = {'Resources': {
+            'Topic': {'Type': 'AWS::SNS::Topic', 'Properties': {'TopicName': {'Fn::GetAtt': ['Queue', 'Arn']}}},
+            'Queue': {'Type': 'AWS::SQS::Queue', 'Properties': {'QueueName': 'q1'}}
+        }}
+        template_deployer.deploy_template(template, 'stack1')
+        self.assertEqual([c[0][0] for c in deploy_resource.call_args_list], ['Queue'])
+
+    def test_normalize_params(self):
+        params = {
+            'Arn': 'arn:aws:sqs:us-east-1:123456789012:q1',
+            'Enabled': 'true',
+            'Nested': {'Count': '3', 'Empty': None, 'Arns': ['arn:aws:sns:us-east-1:123456789012:t1', None]},
+            'Empty': None
+        }
+        result = template_deployer.normalize_params(params, {'Enabled': bool, 'Count': int})
+        self.assertEqual(result, {
+            'Arn': 'arn:aws:sqs:us-east-1:000000000000:q1',
+            'Enabled': True,
+            'Nested': {'Count': 3, 'Arns': ['arn:aws:sns:us-east-1:000000000000:t1', None]}
+        })